@@ -38,27 +38,43 @@ NUMBER_OF_AUTHORS_DEFAULT = "ALL"  # First X authors + last author included; or
 WRITE_STARTER_CSV_DEFAULT = False  # Change to True to also write "<xlsx_base>_full.csv"
 
 import argparse
+import csv
 import datetime as _dt
+import json
+import math
 import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Any, Dict, List, Optional, Callable, Set, Union, Tuple, DefaultDict
 from collections import defaultdict
 
 import time
 import random
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
 import pandas as pd
 from dotenv import load_dotenv
 
+try:  # optional: faster JSON decoding of API pages
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
+
 # Load environment variables from .env (if present)
 load_dotenv()
 
 API_URL = "https://api.clarivate.com/apis/wos-starter/v1"
+DOI_URL_PREFIX = "https://doi.org/"
+WOS_RECORD_URL_PREFIX = "https://www.webofscience.com/wos/woscc/full-record/"
 API_DB  = "WOS"
 PAGE_LIMIT = 50
 
 # Excel constraints
 EXCEL_CELL_CHAR_LIMIT = 32767
+TRUNCATION_MARKER = " … [truncated]"
 # Hyperlink threshold (Excel ~65,530 links/worksheet); use halfish to be safe
 HYPERLINK_THRESHOLD = 32765
 
@@ -74,6 +90,19 @@ BASE_429_SLEEP = 1.0         # fallback if no Retry-After
 MAX_TRANSIENT_RETRIES = 6    # for 5xx/408/network hiccups
 BASE_5XX_SLEEP = 1.0         # starting backoff for 5xx
 TRANSIENT_STATUSES = {500, 502, 503, 504, 408}
+MAX_FETCH_WORKERS = 4        # concurrent page fetches (still capped by MIN_INTERVAL)
+STREAM_MIN_BYTES = 100 * 1024  # read bodies at least this large straight off the socket
+
+# Shared HTTP session: keep-alive + pooled connections across page fetches
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=0))
+
+# Rate limiter state shared by all fetch threads (monotonic time of last request start)
+_rate_lock = threading.Lock()
+_last_request_ts = [0.0]
+
+# Per-thread RNG for retry jitter (avoids contending on the global random lock)
+_TLS = threading.local()
 
 SORT_DESCRIPTION = "Sorted by: Times Cited ↓, Publication Year ↓"
 
@@ -143,16 +172,20 @@ def _pick(d: Optional[dict], *keys, default=None):
             return default
     return cur if cur is not None else default
 
+def _path_getter(*keys: str) -> Callable[[Dict[str, Any]], Any]:
+    """Specialized _pick for a fixed key path, built once at make_mappers time."""
+    def getter(d: Optional[dict]) -> Any:
+        cur = d
+        for k in keys:
+            if not isinstance(cur, dict):
+                return None
+            cur = cur.get(k)
+        return cur
+    return getter
+
 def _join(vals: List[str]) -> str:
-    out, seen = [], set()
-    for v in vals or []:
-        if v is None:
-            continue
-        s = str(v)
-        if s not in seen:
-            seen.add(s)
-            out.append(s)
-    return "; ".join(out)
+    # dict.fromkeys de-duplicates while preserving first-seen order
+    return "; ".join(dict.fromkeys(str(v) for v in (vals or []) if v is not None))
 
 def _resolve_author_limit(cli_value: Optional[str]) -> Union[str, int]:
     """Resolve author limit from CLI > env > default."""
@@ -178,36 +211,71 @@ def _resolve_author_limit(cli_value: Optional[str]) -> Union[str, int]:
 
     return NUMBER_OF_AUTHORS_DEFAULT
 
-def _authors_field_limited(hit: Dict[str, Any], *, field: str, author_limit: Union[str, int, None] = None) -> str:
-    authors = _pick(hit, "names", "authors", default=[]) or []
-    if not isinstance(authors, list):
-        authors = [authors]
-    names = [ (a.get(field) or "").strip()
-              for a in authors if (a.get(field) or "").strip() ]
-    if not names:
-        return ""
-
+def _author_limit_n(author_limit: Union[str, int, None]) -> Optional[int]:
+    """Return the numeric author limit, or None when all authors are shown."""
     limit: Union[str, int] = author_limit if author_limit is not None else NUMBER_OF_AUTHORS_DEFAULT
     if isinstance(limit, str) and limit.strip().upper() == "ALL":
-        return "; ".join(names)
-
+        return None
     try:
         n = int(limit)
-    except Exception:
-        n = NUMBER_OF_AUTHORS_DEFAULT
+    except (TypeError, ValueError):
+        return None
+    return n if n > 0 else None
 
-    if n <= 0 or len(names) <= n:
+def _join_limited(names: List[str], n: Optional[int]) -> str:
+    if n is None or len(names) <= n:
         return "; ".join(names)
+    return "; ".join(names[:n]) + "; ...; " + names[-1]
 
-    first_n = names[:n]
-    last_author = names[-1]
-    return "; ".join(first_n) + "; ...; " + last_author
+def _author_bundle(hit: Dict[str, Any], author_limit: Union[str, int, None]) -> Tuple[str, str, str]:
+    """
+    (Author Full Names, Authors, Researcher Ids) for a hit, computed in a single
+    pass over names.authors and memoized on the hit (keyed by author_limit).
+    transform_hit_to_row drops the memo once the hit's row is built.
+    """
+    cached = hit.get("_author_cache")
+    if cached is not None and cached[0] == author_limit:
+        return cached[1]
+
+    authors = _pick(hit, "names", "authors", default=[]) or []
+    if not isinstance(authors, list):
+        authors = [authors]
+
+    n = _author_limit_n(author_limit)
+    # Researcher Ids use first N + last of the raw author list
+    last_idx = len(authors) - 1
+    limit_rids = n is not None and len(authors) > n
+
+    display: List[str] = []
+    wosstd: List[str] = []
+    pairs: List[str] = []
+    for idx, a in enumerate(authors):
+        if not isinstance(a, dict):
+            continue
+        # str() so one odd-typed field (e.g. a numeric researcherId) can't
+        # fail the whole bundle and blank all three author columns
+        dn = str(a.get("displayName") or "").strip()
+        ws = str(a.get("wosStandard") or "").strip()
+        if dn:
+            display.append(dn)
+        if ws:
+            wosstd.append(ws)
+        if limit_rids and n <= idx < last_idx:
+            continue
+        rid = str(a.get("researcherId") or "").strip()
+        if rid:
+            name = dn or ws
+            pairs.append(f"{name}/{rid}" if name else rid)
+
+    bundle = (_join_limited(display, n), _join_limited(wosstd, n), "; ".join(dict.fromkeys(pairs)))
+    hit["_author_cache"] = (author_limit, bundle)
+    return bundle
 
 def _authors_display_limited(hit: Dict[str, Any], *, author_limit: Union[str, int, None] = None) -> str:
-    return _authors_field_limited(hit, field="displayName", author_limit=author_limit)
+    return _author_bundle(hit, author_limit)[0]
 
 def _authors_wosstandard_limited(hit: Dict[str, Any], *, author_limit: Union[str, int, None] = None) -> str:
-    return _authors_field_limited(hit, field="wosStandard", author_limit=author_limit)
+    return _author_bundle(hit, author_limit)[1]
 
 def _wos_citations(hit: Dict[str, Any]) -> int:
     cites = hit.get("citations", []) or []
@@ -226,7 +294,7 @@ def _meeting_abstract(hit: Dict[str, Any]) -> str:
 
 def _doi_link(hit: Dict[str, Any]) -> str:
     doi = _pick(hit, "identifiers", "doi")
-    return f"https://doi.org/{doi}" if doi else ""
+    return f"{DOI_URL_PREFIX}{doi}" if doi else ""
 
 def _now_date() -> str:
     return _dt.date.today().isoformat()
@@ -242,7 +310,7 @@ def _pub_type_rules(hit: Dict[str, Any]) -> str:
 
 def _wos_full_record_link(hit: Dict[str, Any]) -> str:
     uid = hit.get("uid")
-    return f"https://www.webofscience.com/wos/woscc/full-record/{uid}" if uid else ""
+    return f"{WOS_RECORD_URL_PREFIX}{uid}" if uid else ""
 
 def _pub_year(hit: Dict[str, Any]) -> Optional[int]:
     py = _pick(hit, "source", "publishYear")
@@ -263,39 +331,7 @@ def _names_list(hit: Dict[str, Any], path_a: List[str], path_b: Optional[List[st
     return out
 
 def _researcher_ids_named(hit: Dict[str, Any], *, author_limit: Union[str, int, None] = None) -> str:
-    authors = _pick(hit, "names", "authors", default=[]) or []
-    if not isinstance(authors, list):
-        authors = [authors]
-
-    if not authors:
-        return ""
-
-    # Determine which author indices to include (first N + last, or ALL)
-    limit: Union[str, int] = author_limit if author_limit is not None else NUMBER_OF_AUTHORS_DEFAULT
-    if isinstance(limit, str) and limit.strip().upper() == "ALL":
-        indices = list(range(len(authors)))
-    else:
-        try:
-            n = int(limit)
-        except Exception:
-            n = NUMBER_OF_AUTHORS_DEFAULT
-        if n <= 0 or len(authors) <= n:
-            indices = list(range(len(authors)))
-        else:
-            indices = list(range(n)) + [len(authors) - 1]
-
-    pairs: List[str] = []
-    for idx in indices:
-        a = authors[idx] or {}
-        if not isinstance(a, dict):
-            continue
-        rid = (a.get("researcherId") or "").strip()
-        if not rid:
-            continue
-        name = (a.get("displayName") or a.get("wosStandard") or "").strip()
-        pairs.append(f"{name}/{rid}" if name else rid)
-
-    return "; ".join(pairs)
+    return _author_bundle(hit, author_limit)[2]
 
 def _book_authors(hit: Dict[str, Any]) -> str:
     return "; ".join(_names_list(hit, ["books"]))
@@ -326,27 +362,27 @@ def make_mappers(author_limit: Union[str, int]) -> Dict[str, Callable[[Dict[str,
         "Researcher Ids":    lambda h: _researcher_ids_named(h, author_limit=author_limit),
         "ORCIDs":            lambda h: "",
         "Article Title":     lambda h: h.get("title"),
-        "Source Title":      lambda h: _pick(h, "source", "sourceTitle"),
+        "Source Title":      _path_getter("source", "sourceTitle"),
         "Document Type":     lambda h: _join(h.get("sourceTypes") or []),
         "Author Keywords":   lambda h: _join(_pick(h, "keywords", "authorKeywords", default=[]) or []),
         "Times Cited, WoS Core": lambda h: _wos_citations(h),
-        "ISSN":              lambda h: _pick(h, "identifiers", "issn"),
-        "eISSN":             lambda h: _pick(h, "identifiers", "eissn"),
-        "ISBN":              lambda h: _pick(h, "identifiers", "isbn"),
-        "DOI":               lambda h: _pick(h, "identifiers", "doi"),
+        "ISSN":              _path_getter("identifiers", "issn"),
+        "eISSN":             _path_getter("identifiers", "eissn"),
+        "ISBN":              _path_getter("identifiers", "isbn"),
+        "DOI":               _path_getter("identifiers", "doi"),
         "DOI Link":          lambda h: _doi_link(h),
-        "Pubmed Id":         lambda h: _pick(h, "identifiers", "pmid"),
-        "Publication Date":  lambda h: _pick(h, "source", "publishMonth"),
-        "Publication Year":  lambda h: _pick(h, "source", "publishYear"),
-        "Volume":            lambda h: _pick(h, "source", "volume"),
-        "Issue":             lambda h: _pick(h, "source", "issue"),
-        "Supplement":        lambda h: _pick(h, "source", "supplement"),
-        "Special Issue":     lambda h: _pick(h, "source", "specialIssue"),
+        "Pubmed Id":         _path_getter("identifiers", "pmid"),
+        "Publication Date":  _path_getter("source", "publishMonth"),
+        "Publication Year":  _path_getter("source", "publishYear"),
+        "Volume":            _path_getter("source", "volume"),
+        "Issue":             _path_getter("source", "issue"),
+        "Supplement":        _path_getter("source", "supplement"),
+        "Special Issue":     _path_getter("source", "specialIssue"),
         "Meeting Abstract":  lambda h: _meeting_abstract(h),
-        "Start Page":        lambda h: _pick(h, "source", "pages", "begin"),
-        "End Page":          lambda h: _pick(h, "source", "pages", "end"),
-        "Article Number":    lambda h: _pick(h, "source", "articleNumber"),
-        "Number of Pages":   lambda h: _pick(h, "source", "pages", "count"),
+        "Start Page":        _path_getter("source", "pages", "begin"),
+        "End Page":          _path_getter("source", "pages", "end"),
+        "Article Number":    _path_getter("source", "articleNumber"),
+        "Number of Pages":   _path_getter("source", "pages", "count"),
         "Date of Export":        lambda h: _now_date(),
         "UT (Unique WOS ID)":    lambda h: h.get("uid"),
         "Web of Science Record": _wos_full_record_link,
@@ -361,53 +397,104 @@ def _print_400_hint():
     print(f"Only the following fields can be searched using the Starter API: {fields}.")
     print("Please check your search and try again. See the Swagger definition for more information.")
 
-def _get_json(path: str, params: dict, apikey: str, timeout: int = 60) -> dict:
+def _rand() -> random.Random:
+    r = getattr(_TLS, "r", None)
+    if r is None:
+        r = random.Random()
+        _TLS.r = r
+    return r
+
+def _throttle():
+    """Keep request starts ≥ MIN_INTERVAL apart, sleeping only for the remainder."""
+    with _rate_lock:
+        wait = MIN_INTERVAL - (time.monotonic() - _last_request_ts[0])
+        if wait > 0:
+            time.sleep(wait)
+        _last_request_ts[0] = time.monotonic()
+
+def _backoff(seconds: float, stop: Optional[threading.Event] = None):
+    """Sleep before a retry; returns early if `stop` is set."""
+    if stop is None:
+        time.sleep(seconds)
+    else:
+        stop.wait(seconds)
+
+def _read_body(resp: requests.Response) -> bytes:
+    """
+    Read a streamed response body. Large payloads are read straight from the
+    socket in one go, skipping requests' chunk list + join (which briefly holds
+    the page twice); small or unknown-length bodies use resp.content.
+    """
+    size = resp.headers.get("Content-Length", "")
+    if size.isdigit() and int(size) >= STREAM_MIN_BYTES:
+        return resp.raw.read(decode_content=True)
+    return resp.content
+
+def _decode_json(resp: requests.Response) -> Any:
+    """Decode a response body with orjson when available, else stdlib json."""
+    body = _read_body(resp)
+    if _orjson is None:
+        return json.loads(body)
+    return _orjson.loads(body)  # orjson.JSONDecodeError is a ValueError
+
+def _get_json(path: str, params: dict, apikey: str, timeout: int = 60,
+              stop: Optional[threading.Event] = None) -> dict:
     """
     Robust GET with polite throttling and retries.
+    If `stop` is set (e.g. another page failed), give up between attempts.
     """
     url = f"{API_URL}/{path}"
+    if _SESSION.headers.get("X-ApiKey") != apikey:
+        _SESSION.headers.update({"X-ApiKey": apikey})
     last_err = None
-    time.sleep(MIN_INTERVAL)  # keep ≤ 5 rps
 
     max_attempts = max(MAX_429_RETRIES, MAX_TRANSIENT_RETRIES) + 1
     for attempt in range(max_attempts):
+        if stop is not None and stop.is_set():
+            raise RuntimeError(f"Request to {url} cancelled")
+        _throttle()  # keep ≤ 5 rps, even across threads
         try:
-            resp = requests.get(url, params=params, headers={"X-ApiKey": apikey}, timeout=timeout)
-
-            if resp.status_code == 400:
-                _print_400_hint()
-                raise SystemExit(1)
-
-            if resp.status_code == 429:
-                ra = resp.headers.get("Retry-After")
+            with _SESSION.get(url, params=params, timeout=timeout, stream=True) as resp:
+                if resp.status_code == 400:
+                    _print_400_hint()
+                    raise SystemExit(1)
+
+                if resp.status_code == 429 or resp.status_code in TRANSIENT_STATUSES:
+                    # Drain the (small) error body so urllib3 can return the
+                    # connection to the pool instead of discarding it on close
+                    _ = resp.content
+
+                if resp.status_code == 429:
+                    ra = resp.headers.get("Retry-After")
+                    try:
+                        sleep_s = max(MIN_INTERVAL, float(ra) if ra is not None else BASE_429_SLEEP * (2 ** attempt))
+                    except ValueError:
+                        sleep_s = max(MIN_INTERVAL, BASE_429_SLEEP * (2 ** attempt))
+                    _backoff(sleep_s, stop)
+                    continue
+
+                if resp.status_code in TRANSIENT_STATUSES:
+                    jitter = _rand().random() * 0.25
+                    sleep_s = max(MIN_INTERVAL, min(30.0, BASE_5XX_SLEEP * (2 ** attempt))) + jitter
+                    _backoff(sleep_s, stop)
+                    continue
+
+                resp.raise_for_status()
                 try:
-                    sleep_s = max(MIN_INTERVAL, float(ra) if ra is not None else BASE_429_SLEEP * (2 ** attempt))
-                except ValueError:
-                    sleep_s = max(MIN_INTERVAL, BASE_429_SLEEP * (2 ** attempt))
-                time.sleep(sleep_s)
-                continue
-
-            if resp.status_code in TRANSIENT_STATUSES:
-                jitter = random.random() * 0.25
-                sleep_s = max(MIN_INTERVAL, min(30.0, BASE_5XX_SLEEP * (2 ** attempt))) + jitter
-                time.sleep(sleep_s)
-                continue
-
-            resp.raise_for_status()
-            try:
-                return resp.json() or {}
-            except ValueError as e:
-                last_err = e
-                jitter = random.random() * 0.25
-                sleep_s = max(MIN_INTERVAL, min(30.0, BASE_5XX_SLEEP * (2 ** attempt))) + jitter
-                time.sleep(sleep_s)
-                continue
-
-        except requests.exceptions.RequestException as e:
+                    return _decode_json(resp) or {}
+                except ValueError as e:
+                    last_err = e
+                    jitter = _rand().random() * 0.25
+                    sleep_s = max(MIN_INTERVAL, min(30.0, BASE_5XX_SLEEP * (2 ** attempt))) + jitter
+                    _backoff(sleep_s, stop)
+                    continue
+
+        except (requests.exceptions.RequestException, Urllib3HTTPError) as e:
+            # Urllib3HTTPError: failures while reading a streamed body via resp.raw
             last_err = e
-            jitter = random.random() * 0.25
+            jitter = _rand().random() * 0.25
             sleep_s = max(MIN_INTERVAL, min(30.0, BASE_5XX_SLEEP * (2 ** attempt))) + jitter
-            time.sleep(sleep_s)
+            _backoff(sleep_s, stop)
             continue
 
     raise RuntimeError(f"Request to {url} failed after retries: {last_err}")
@@ -417,10 +504,9 @@ def _get_json(path: str, params: dict, apikey: str, timeout: int = 60) -> dict:
 # ==========================
 
 def fetch_all_by_query(q: str, apikey: str, db: str = API_DB, limit: int = PAGE_LIMIT) -> List[Dict[str, Any]]:
-    page = 1
     hits: List[Dict[str, Any]] = []
 
-    params = {"db": db, "q": q, "limit": limit, "page": page}
+    params = {"db": db, "q": q, "limit": limit, "page": 1}
     data = _get_json("documents", params=params, apikey=apikey)
     batch = data.get("hits", []) or []
     meta = data.get("metadata", {}) or {}
@@ -438,17 +524,52 @@ def fetch_all_by_query(q: str, apikey: str, db: str = API_DB, limit: int = PAGE_
     hits.extend(batch)
     print(f"Retrieved {len(hits)}/{total} ...")
 
-    # Additional pages
-    page += 1
-    while len(hits) < total and batch:
-        params = {"db": db, "q": q, "limit": limit, "page": page}
-        data = _get_json("documents", params=params, apikey=apikey)
-        batch = data.get("hits", []) or []
-        if not batch:
-            break
-        hits.extend(batch)
-        print(f"Retrieved {len(hits)}/{total} ...")
-        page += 1
+    # Additional pages: all page numbers are known from `total`, so fetch them
+    # concurrently and reassemble in page order.
+    npages = math.ceil(total / limit)
+    if batch and npages > 1:
+        # One stop flag per page, so pages past the first empty one (or all of
+        # them, after a fatal error) can give up mid-retry
+        stops = {p: threading.Event() for p in range(2, npages + 1)}
+
+        def _fetch_page(page: int) -> List[Dict[str, Any]]:
+            params = {"db": db, "q": q, "limit": limit, "page": page}
+            data = _get_json("documents", params=params, apikey=apikey, stop=stops[page])
+            return data.get("hits", []) or []
+
+        batches: Dict[int, List[Dict[str, Any]]] = {}
+        retrieved = len(hits)
+        first_empty = npages + 1  # like the sequential loop, stop at the first empty page
+        # Not a context manager: its exit waits for in-flight workers, which on
+        # Ctrl-C or a fatal error could sit in _get_json's retry loop for minutes.
+        pool = ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS)
+        try:
+            futures = {pool.submit(_fetch_page, p): p for p in range(2, npages + 1)}
+            for fut in as_completed(futures):
+                page = futures[fut]
+                if fut.cancelled() or page > first_empty:
+                    continue
+                batch = fut.result()
+                if not batch:
+                    first_empty = page
+                    for f, p in futures.items():
+                        if p > page:
+                            stops[p].set()
+                            f.cancel()
+                    continue
+                batches[page] = batch
+                retrieved += len(batch)
+                print(f"Retrieved {retrieved}/{total} ...")
+        except BaseException:
+            # Don't keep fetching (or retrying) the remaining pages after a fatal error
+            for ev in stops.values():
+                ev.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        pool.shutdown()
+
+        for p in range(2, first_empty):
+            hits.extend(batches.get(p, []))
 
     for h in hits:
         h["_total_records"] = total
@@ -462,17 +583,28 @@ def fetch_all_by_ut(ut_list: List[str], apikey: str, db: str = API_DB, limit: in
 # Transform
 # ==========================
 
-def transform_hit_to_row(hit: Dict[str, Any], columns: List[str], mappers: Dict[str, Callable[[Dict[str, Any]], Any]]) -> Dict[str, Any]:
-    row: Dict[str, Any] = {}
-    for col in columns:
-        f = mappers.get(col)
+ColFnPairs = List[Tuple[str, Optional[Callable[[Dict[str, Any]], Any]]]]
+
+def column_fn_pairs(columns: List[str], mappers: Dict[str, Callable[[Dict[str, Any]], Any]]) -> ColFnPairs:
+    """Resolve each column's mapper once, so per-row transforms skip the dict lookup."""
+    return [(col, mappers.get(col)) for col in columns]
+
+def transform_hit_to_row(hit: Dict[str, Any], col_fn_pairs: ColFnPairs) -> Tuple[List[Any], str]:
+    """Return (values aligned with col_fn_pairs, the hit's UID)."""
+    row: List[Any] = []
+    for _col, f in col_fn_pairs:
+        if f is None:
+            row.append("")
+            continue
         try:
-            row[col] = f(hit) if f else ""
-        except Exception:
-            row[col] = ""
-    row["_total_records"] = hit.get("_total_records", None)
-    row["_uid"] = hit.get("uid", "")
-    return row
+            row.append(f(hit))
+        except (AttributeError, KeyError, TypeError, ValueError):
+            # Malformed/unexpected record shapes (e.g., a non-dict author entry)
+            row.append("")
+    # The author bundle is only shared by this row's author columns; don't keep
+    # every hit's joined author strings alive for the rest of the run
+    hit.pop("_author_cache", None)
+    return row, hit.get("uid", "")
 
 def build_auto_filename(query: str, outdir: str, ext: str = ".xlsx") -> str:
     clean_query = "".join(ch for ch in query if ch.isalnum() or ch.isspace()).strip()
@@ -482,88 +614,104 @@ def build_auto_filename(query: str, outdir: str, ext: str = ".xlsx") -> str:
     return filename, timestamp
 
 def _cell_with_blocker(val):
-    try:
-        if val is None:
-            return " "
-        import pandas as _pd
-        if _pd.isna(val):
-            return " "
-    except Exception:
-        pass
-    if isinstance(val, str) and val == "":
+    if val is None or (isinstance(val, str) and val == ""):
         return " "
     return val
 
 def _is_url(s: Any) -> bool:
-    try:
-        return isinstance(s, str) and s.startswith(("http://", "https://"))
-    except Exception:
-        return False
-
-def _truncate_if_needed(s: Any) -> Tuple[Any, bool]:
-    if not isinstance(s, str):
-        return s, False
-    if len(s) <= EXCEL_CELL_CHAR_LIMIT:
-        return s, False
-    marker = " … [truncated]"
-    head = EXCEL_CELL_CHAR_LIMIT - len(marker)
-    if head < 0:
-        head = 0
-    return s[:head] + marker, True
+    # Neither check can raise, so no try/except; only called for hyperlink columns
+    return type(s) is str and (s[:8] == "https://" or s[:7] == "http://")
 
 # ==========================
 # Excel writing
 # ==========================
 
-def write_sheet_nowrap_fixedheight(writer,
-                                   df: pd.DataFrame,
-                                   sheet_name: str,
-                                   headers: List[str],
-                                   hyperlink_cols: Set[str],
-                                   width_chars: float = 8.43,
-                                   row_height: float = 12.75,
-                                   trunc_report: Optional[DefaultDict[str, List[str]]] = None):
+def write_sheets_nowrap_fixedheight(writer,
+                                    hits: List[Dict[str, Any]],
+                                    sheets: List[Tuple[str, List[str]]],
+                                    mappers: Dict[str, Callable[[Dict[str, Any]], Any]],
+                                    hyperlink_cols: Set[str],
+                                    width_chars: float = 8.43,
+                                    row_height: float = 12.75,
+                                    trunc_report: Optional[DefaultDict[str, List[str]]] = None,
+                                    csv_writer: Optional[Any] = None,
+                                    csv_headers: Optional[List[str]] = None):
+    """
+    Write one or more (sheet_name, headers) sheets from the same hits.
+
+    Each hit is transformed once over the union of all sheets' headers and every
+    sheet gets its projection of that row. Sheets are filled row by row in
+    lockstep, which constant_memory allows since each sheet stays top-to-bottom.
+    If csv_writer (a csv.writer) is given, it receives the csv_headers projection
+    of the same row with FULL, untruncated values.
+    """
     book = writer.book
-    ws = book.add_worksheet(sheet_name)
 
     header_fmt = book.add_format({'bold': False, 'font_name': 'Arial', 'font_size': 10})
     body_fmt   = book.add_format({'font_name': 'Arial', 'font_size': 10})
 
-    ws.set_default_row(row_height)
-    ws.set_row(0, row_height)
-
-    # Header row
-    for c, h in enumerate(headers):
-        ws.write(0, c, h, header_fmt)
-        ws.set_column(c, c, width_chars)
-
-    # Body rows
-    for r_idx, (_, row) in enumerate(df.iterrows(), start=1):
-        ws.set_row(r_idx, row_height)
-        ut = row.get("UT (Unique WOS ID)", "") or row.get("_uid", "")
-        for c_idx, h in enumerate(headers):
-            raw = row.get(h, "")
+    # Union of all sheets' headers (ALL_HEADERS covers the Starter subset)
+    columns = list(dict.fromkeys(h for _, headers in sheets for h in headers))
+    col_pos = {h: i for i, h in enumerate(columns)}
+
+    targets = []
+    for sheet_name, headers in sheets:
+        ws = book.add_worksheet(sheet_name)
+        # Every row uses the default height, so no per-row set_row calls are needed
+        ws.set_default_row(row_height)
+
+        # Header row
+        ws.write_row(0, 0, headers, header_fmt)
+        ws.set_column(0, len(headers) - 1, width_chars)
+
+        positions = [col_pos[h] for h in headers]
+        url_col_indices = [c_idx for c_idx, h in enumerate(headers) if h in hyperlink_cols]
+        targets.append((ws, positions, url_col_indices))
+
+    # Body rows: transform each hit once, as it is written (no intermediate DataFrame)
+    csv_positions = [col_pos[h] for h in (csv_headers or [])]
+    col_fn_pairs = column_fn_pairs(columns, mappers)
+    trunc_head = max(0, EXCEL_CELL_CHAR_LIMIT - len(TRUNCATION_MARKER))
+    for r_idx, hit in enumerate(hits, start=1):
+        row, ut = transform_hit_to_row(hit, col_fn_pairs)
+        if csv_writer is not None:
+            csv_writer.writerow([row[i] for i in csv_positions])
+        full_values = []
+        for c_idx, raw in enumerate(row):
             val = _cell_with_blocker(raw)
-            val, was_trunc = _truncate_if_needed(val)
-            if was_trunc and trunc_report is not None:
-                trunc_report[h].append(str(ut) or f"row{r_idx}")
-            if h in hyperlink_cols and _is_url(val):
-                ws.write_url(r_idx, c_idx, val, body_fmt, string=val)
-            else:
-                if _is_url(val):
-                    ws.write_string(r_idx, c_idx, val, body_fmt)
-                else:
+            # Any column can carry an oversized string; write_row stops at the
+            # first cell it rejects, so every string cell must be checked.
+            if isinstance(val, str) and len(val) > EXCEL_CELL_CHAR_LIMIT:
+                val = val[:trunc_head] + TRUNCATION_MARKER
+                if trunc_report is not None:
+                    trunc_report[columns[c_idx]].append(str(ut) or f"row{r_idx}")
+            full_values.append(val)
+
+        for ws, positions, url_col_indices in targets:
+            row_values = [full_values[i] for i in positions]
+            # Bulk-write the row, then overlay the clickable link cells. write_row
+            # gives up at the first rejected cell; fall back to per-cell writes
+            # so the cells after it are not lost.
+            if ws.write_row(r_idx, 0, row_values, body_fmt) < 0:
+                for c_idx, val in enumerate(row_values):
                     ws.write(r_idx, c_idx, val, body_fmt)
+            for c_idx in url_col_indices:
+                val = row_values[c_idx]
+                if _is_url(val):
+                    ws.write_url(r_idx, c_idx, val, body_fmt, string=val)
 
 # ==========================
 # Sorting
 # ==========================
 
 def _sort_hits_in_place(hits: List[Dict[str, Any]]):
-    def _py_for_sort(rec: Dict[str, Any]) -> int:
-        py = _pub_year(rec)
-        return -1 if py is None else py
-    hits.sort(key=lambda rec: (_wos_citations(rec), _py_for_sort(rec)), reverse=True)
+    # Extract both sort keys once, then lexsort (last key is primary). lexsort is
+    # stable, so ties keep API order just like list.sort(reverse=True) did.
+    n = len(hits)
+    cites = np.fromiter((_wos_citations(h) for h in hits), dtype=np.int64, count=n)
+    years = np.fromiter((y if (y := _pub_year(h)) is not None else -1 for h in hits), dtype=np.int64, count=n)
+    order = np.lexsort((-years, -cites))
+    hits[:] = [hits[i] for i in order]
 
 # ==========================
 # CLI
@@ -640,13 +788,6 @@ def main():
     # Build mappers with resolved author limit
     mappers = make_mappers(author_limit)
 
-    # Build DataFrames (FULL, untruncated values)
-    df1 = pd.DataFrame([transform_hit_to_row(h, SHEET1_HEADERS, mappers) for h in hits], columns=SHEET1_HEADERS)
-    df2 = pd.DataFrame([transform_hit_to_row(h, ALL_HEADERS, mappers) for h in hits], columns=ALL_HEADERS)
-    for df in (df1, df2):
-        if "_total_records" in df.columns:
-            df.drop(columns=["_total_records"], inplace=True, errors="ignore")
-
     # Summary sheet base rows
     summary_rows = [
         f"Query: {query_used}",
@@ -661,10 +802,27 @@ def main():
     # Truncation reporting (column -> list of UTs)
     trunc_report: DefaultDict[str, List[str]] = defaultdict(list)
 
-    # Write Excel
-    with pd.ExcelWriter(out_path, engine="xlsxwriter") as writer:
-        write_sheet_nowrap_fixedheight(writer, df1, "Starter subset", SHEET1_HEADERS, hyperlink_cols, width_chars=8.43, row_height=12.75, trunc_report=trunc_report)
-        write_sheet_nowrap_fixedheight(writer, df2, "Core export (full)", ALL_HEADERS, hyperlink_cols, width_chars=8.43, row_height=12.75, trunc_report=trunc_report)
+    # Write Excel. constant_memory flushes each row to disk as soon as the next
+    # row starts, so every sheet below must be written strictly top-to-bottom.
+    # URL cells are written explicitly via write_url, so disable auto-detection.
+    xlsx_options = {"constant_memory": True, "strings_to_urls": False}
+    with pd.ExcelWriter(out_path, engine="xlsxwriter", engine_kwargs={"options": xlsx_options}) as writer:
+        # CSV (optional): Starter subset written in the same pass as the sheets
+        csv_written = None
+        csv_file = None
+        csv_writer = None
+        if write_csv:
+            csv1 = f"{base}_full.csv"
+            csv_file = open(csv1, "w", newline="", encoding="utf-8-sig")
+            csv_writer = csv.writer(csv_file, lineterminator=os.linesep)
+            csv_writer.writerow(SHEET1_HEADERS)
+
+        try:
+            sheets = [("Starter subset", SHEET1_HEADERS), ("Core export (full)", ALL_HEADERS)]
+            write_sheets_nowrap_fixedheight(writer, hits, sheets, mappers, hyperlink_cols, width_chars=8.43, row_height=12.75, trunc_report=trunc_report, csv_writer=csv_writer, csv_headers=SHEET1_HEADERS)
+        finally:
+            if csv_file is not None:
+                csv_file.close()
 
         # Truncation notes
         if trunc_report:
@@ -680,11 +838,8 @@ def main():
                     f"- {col}: {len(unique_uts)} row(s) truncated. UTs: {show}{more}"
                 )
 
-        # CSV (optional)
-        csv_written = None
+        # CSV notes
         if write_csv:
-            csv1 = f"{base}_full.csv"
-            df1.to_csv(csv1, index=False, encoding="utf-8-sig")
             summary_rows.append("")
             summary_rows.append("CSV written (full text, no truncation):")
             summary_rows.append(f"- Starter subset: {csv1}")
@@ -696,11 +851,9 @@ def main():
         header_fmt = writer.book.add_format({'bold': False, 'font_name': 'Arial', 'font_size': 10})
         body_fmt   = writer.book.add_format({'font_name': 'Arial', 'font_size': 10})
         ws.set_default_row(12.75)
-        ws.set_row(0, 12.75)
         ws.write(0, 0, "Summary", header_fmt)
         ws.set_column(0, 0, 8.43)
         for r, val in enumerate(df3["Summary"].tolist(), start=1):
-            ws.set_row(r, 12.75)
             text = " " if (val is None or str(val).strip() == "") else str(val)
             ws.write_string(r, 0, text, body_fmt)
 